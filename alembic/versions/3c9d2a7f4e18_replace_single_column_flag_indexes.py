@@ -0,0 +1,29 @@
+"""Replace single-column flag indexes
+
+Revision ID: 3c9d2a7f4e18
+Revises: eb0ed45b958b
+Create Date: 2026-10-14 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9d2a7f4e18'
+down_revision = 'eb0ed45b958b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # uq_flag_name_environment already covers (name, environment) lookups
+    op.drop_index('ix_feature_flags_name', table_name='feature_flags', if_exists=True)
+    op.drop_index('ix_feature_flags_environment', table_name='feature_flags', if_exists=True)
+    op.create_index('ix_feature_flags_environment_id', 'feature_flags', ['environment', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_feature_flags_environment_id', table_name='feature_flags')
+    op.create_index('ix_feature_flags_environment', 'feature_flags', ['environment'], unique=False)
+    op.create_index('ix_feature_flags_name', 'feature_flags', ['name'], unique=False)
@@ -2,6 +2,8 @@
 Authentication module for FlagShip API.
 Implements API key-based authentication.
 """
+import hashlib
+from functools import lru_cache
 from fastapi import Security, HTTPException, status
 from fastapi.security import APIKeyHeader
 from app.config import settings
@@ -10,16 +12,27 @@ from app.logger import logger
 # API Key header name
 API_KEY_HEADER = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+# Keys are held and compared as SHA-256 digests. Looking up a digest does
+# not leak timing information about the stored keys, because a caller
+# cannot choose the digest bytes of the key they present.
+def hash_api_key(api_key: str) -> bytes:
+    """Return the SHA-256 digest used to store and compare an API key."""
+    return hashlib.sha256(api_key.encode()).digest()
+
+
 # In production, store API keys in database
 # For now, using environment variable for simplicity
 # Format: API_KEYS=key1,key2,key3
-def get_api_keys() -> list[str]:
-    """Get valid API keys from environment or config."""
+# Settings are loaded once at startup, so the parsed set is cached; call
+# get_api_keys.cache_clear() after changing settings.API_KEYS (e.g. in tests).
+@lru_cache(maxsize=1)
+def get_api_keys() -> frozenset[bytes]:
+    """Get digests of the valid API keys from environment or config."""
     api_keys_str = getattr(settings, "API_KEYS", "")
     if api_keys_str:
-        return [key.strip() for key in api_keys_str.split(",") if key.strip()]
+        return frozenset(hash_api_key(key.strip()) for key in api_keys_str.split(",") if key.strip())
     # Default key for development (should be changed in production)
-    return ["dev-api-key-12345"]
+    return frozenset({hash_api_key("dev-api-key-12345")})
 
 
 def verify_api_key(api_key: str = Security(API_KEY_HEADER)) -> str:
@@ -35,8 +48,6 @@ def verify_api_key(api_key: str = Security(API_KEY_HEADER)) -> str:
     Raises:
         HTTPException: If API key is missing or invalid
     """
-    valid_keys = get_api_keys()
-    
     if not api_key:
         logger.warning("API request without API key")
         raise HTTPException(
@@ -45,14 +56,13 @@ def verify_api_key(api_key: str = Security(API_KEY_HEADER)) -> str:
             headers={"WWW-Authenticate": "ApiKey"},
         )
     
-    if api_key not in valid_keys:
-        logger.warning(f"Invalid API key attempted: {api_key[:10]}...")
+    if hash_api_key(api_key) not in get_api_keys():
+        logger.warning("Invalid API key attempted: %s...", api_key[:10])
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key",
             headers={"WWW-Authenticate": "ApiKey"},
         )
     
-    logger.debug(f"API key verified successfully")
+    logger.debug("API key verified successfully")
     return api_key
-
@@ -0,0 +1,86 @@
+"""
+In-process caching for FlagShip.
+Keeps short-lived snapshots of recently seen feature flags, and of
+serialized flag list pages, in memory.
+"""
+import threading
+from typing import Any, Hashable, Optional
+from cachetools import TTLCache
+from app.models import FeatureFlag
+
+# Snapshots expire quickly so changes made by other processes become
+# visible within FLAG_CACHE_TTL seconds.
+FLAG_CACHE_TTL = 15
+FLAG_CACHE_MAXSIZE = 10_000
+FLAG_LIST_CACHE_MAXSIZE = 256
+
+# cachetools caches are not thread-safe and sync endpoints run in a threadpool
+_flag_cache: TTLCache = TTLCache(maxsize=FLAG_CACHE_MAXSIZE, ttl=FLAG_CACHE_TTL)
+_flag_cache_lock = threading.Lock()
+
+# Serialized GET /flags response bodies keyed by the query parameters.
+# Any flag write clears the whole cache; flags change rarely and a write
+# can affect every page.
+_flag_list_cache: TTLCache = TTLCache(maxsize=FLAG_LIST_CACHE_MAXSIZE, ttl=FLAG_CACHE_TTL)
+_flag_list_cache_lock = threading.Lock()
+
+
+def flag_snapshot(flag: FeatureFlag) -> dict[str, Any]:
+    """Copy the column values of a feature flag into a plain dict."""
+    return {
+        "id": flag.id,
+        "name": flag.name,
+        "environment": flag.environment,
+        "enabled": flag.enabled,
+        "rollout": flag.rollout,
+        "updated_at": flag.updated_at,
+    }
+
+
+def get_cached_flag(name: str, environment: str) -> Optional[dict[str, Any]]:
+    """Return the cached snapshot for a flag, or None on a miss."""
+    with _flag_cache_lock:
+        return _flag_cache.get((name, environment))
+
+
+def cache_flag(flag: FeatureFlag) -> dict[str, Any]:
+    """Store a snapshot of a flag and return it."""
+    return cache_flag_snapshot(flag_snapshot(flag))
+
+
+def cache_flag_snapshot(snapshot: dict[str, Any]) -> dict[str, Any]:
+    """Store an already-built flag snapshot and return it."""
+    with _flag_cache_lock:
+        _flag_cache[(snapshot["name"], snapshot["environment"])] = snapshot
+    return snapshot
+
+
+def invalidate_flag(name: str, environment: str) -> None:
+    """Drop the cached snapshot for a flag, if any."""
+    with _flag_cache_lock:
+        _flag_cache.pop((name, environment), None)
+
+
+def get_cached_flag_list(key: Hashable) -> Optional[bytes]:
+    """Return the cached response body for a flag list query, or None on a miss."""
+    with _flag_list_cache_lock:
+        return _flag_list_cache.get(key)
+
+
+def cache_flag_list(key: Hashable, body: bytes) -> None:
+    """Store the response body for a flag list query."""
+    with _flag_list_cache_lock:
+        _flag_list_cache[key] = body
+
+
+def clear_flag_list_cache() -> None:
+    """Drop all cached flag list responses."""
+    with _flag_list_cache_lock:
+        _flag_list_cache.clear()
+
+
+def clear_flag_cache() -> None:
+    """Drop all cached flag snapshots and flag list responses."""
+    with _flag_cache_lock:
+        _flag_cache.clear()
+    clear_flag_list_cache()
@@ -12,6 +12,12 @@ class Settings(BaseSettings):
     DATABASE_PASSWORD: str = "postgres"
     DATABASE_NAME: str = "flags"
     
+    # Connection pool sizing. Sync endpoints run in Starlette's threadpool
+    # (40 threads by default); pool_size + max_overflow matches it so a
+    # worker thread never waits on a connection checkout.
+    DATABASE_POOL_SIZE: int = 20
+    DATABASE_MAX_OVERFLOW: int = 20
+    
     # API configuration
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
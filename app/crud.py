@@ -1,92 +1,278 @@
+import logging
+from sqlalchemy import select, update, func, or_, lambda_stmt
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from typing import Optional, List
+from typing import Any, Optional, List, Tuple
+from uuid import UUID
 from app.models import FeatureFlag
 from app.schemas import FeatureFlagCreate, FeatureFlagUpdate
 from app.exceptions import FlagAlreadyExistsError, DatabaseError
 from app.logger import logger
+from app.cache import (
+    get_cached_flag,
+    cache_flag,
+    cache_flag_snapshot,
+    invalidate_flag,
+    clear_flag_list_cache
+)
+
+
+# Read helpers build their statements with lambda_stmt so SQLAlchemy caches
+# the constructed and compiled SQL per code path; only the bound values
+# captured by each lambda change between calls.
+
+# Column projection for read paths that only need flag values. Selecting
+# columns instead of the FeatureFlag entity skips ORM instance construction
+# and identity-map bookkeeping for every row.
+_SNAPSHOT_COLUMNS = (
+    FeatureFlag.id,
+    FeatureFlag.name,
+    FeatureFlag.environment,
+    FeatureFlag.enabled,
+    FeatureFlag.rollout,
+    FeatureFlag.updated_at,
+)
+_SNAPSHOT_FIELDS = tuple(column.key for column in _SNAPSHOT_COLUMNS)
 
 
 def get_flag(db: Session, name: str, environment: str) -> Optional[FeatureFlag]:
     """Get a feature flag by name and environment."""
-    logger.debug(f"Getting flag: name={name}, environment={environment}")
-    flag = db.query(FeatureFlag).filter(
-        FeatureFlag.name == name,
-        FeatureFlag.environment == environment
-    ).first()
+    logger.debug("Getting flag: name=%s, environment=%s", name, environment)
+    stmt = lambda_stmt(lambda: select(FeatureFlag))
+    stmt += lambda s: s.where(FeatureFlag.name == name).where(FeatureFlag.environment == environment)
+    flag = db.execute(stmt).scalar_one_or_none()
     
     if flag:
-        logger.info(f"Flag found: {name} in {environment}")
+        logger.info("Flag found: %s in %s", name, environment)
     else:
-        logger.debug(f"Flag not found: {name} in {environment}")
+        logger.debug("Flag not found: %s in %s", name, environment)
     
     return flag
 
 
-def get_flag_by_id(db: Session, flag_id: str) -> Optional[FeatureFlag]:
+def get_flag_cached(db: Session, name: str, environment: str) -> Optional[dict[str, Any]]:
+    """
+    Get a snapshot of a feature flag, served from the in-process cache when possible.
+    
+    Misses are loaded as a plain column row and populate the cache. Writes
+    through create_flag, update_flag and delete_flag keep the cache in sync.
+    """
+    cached = get_cached_flag(name, environment)
+    if cached is not None:
+        logger.debug("Flag cache hit: %s in %s", name, environment)
+        return cached
+    
+    logger.debug("Flag cache miss: name=%s, environment=%s", name, environment)
+    stmt = lambda_stmt(lambda: select(*_SNAPSHOT_COLUMNS))
+    stmt += lambda s: s.where(FeatureFlag.name == name).where(FeatureFlag.environment == environment)
+    row = db.execute(stmt).one_or_none()
+    if row is None:
+        logger.debug("Flag not found: %s in %s", name, environment)
+        return None
+    return cache_flag_snapshot(dict(zip(_SNAPSHOT_FIELDS, row)))
+
+
+def get_flags_bulk(db: Session, environment: str, names: List[str]) -> dict[str, dict[str, Any]]:
+    """
+    Get snapshots of several feature flags in one environment, keyed by name.
+    
+    Names already in the flag cache are served from it; the remaining names
+    are fetched with a single query and cached. Unknown names are omitted.
+    """
+    logger.debug("Getting %s flag(s) in %s", len(names), environment)
+    found = {}
+    missing = []
+    for name in dict.fromkeys(names):
+        cached = get_cached_flag(name, environment)
+        if cached is not None:
+            found[name] = cached
+        else:
+            missing.append(name)
+    
+    cache_hits = len(found)
+    if missing:
+        stmt = lambda_stmt(lambda: select(*_SNAPSHOT_COLUMNS))
+        stmt += lambda s: s.where(FeatureFlag.environment == environment).where(FeatureFlag.name.in_(missing))
+        for row in db.execute(stmt):
+            found[row.name] = cache_flag_snapshot(dict(zip(_SNAPSHOT_FIELDS, row)))
+    
+    logger.info("Found %s of %s flag(s) in %s (%s from cache)", len(found), len(names), environment, cache_hits)
+    return found
+
+
+def get_flag_by_id(db: Session, flag_id: UUID) -> Optional[FeatureFlag]:
     """Get a feature flag by ID."""
-    return db.query(FeatureFlag).filter(FeatureFlag.id == flag_id).first()
+    stmt = lambda_stmt(lambda: select(FeatureFlag))
+    stmt += lambda s: s.where(FeatureFlag.id == flag_id)
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def _paginate(
+    stmt: StatementLambdaElement,
+    environment: Optional[str],
+    skip: int,
+    limit: int,
+    after_id: Optional[UUID]
+) -> StatementLambdaElement:
+    """Apply the environment filter, ordering and offset/keyset paging to a list statement."""
+    if environment:
+        stmt += lambda s: s.where(FeatureFlag.environment == environment)
+    
+    stmt += lambda s: s.order_by(FeatureFlag.id)
+    if after_id is not None:
+        stmt += lambda s: s.where(FeatureFlag.id > after_id)
+    else:
+        stmt += lambda s: s.offset(skip)
+    
+    stmt += lambda s: s.limit(limit)
+    return stmt
 
 
 def list_flags(
     db: Session, 
     environment: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    after_id: Optional[UUID] = None
 ) -> List[FeatureFlag]:
-    """List all feature flags, optionally filtered by environment."""
-    logger.debug(f"Listing flags: environment={environment}, skip={skip}, limit={limit}")
-    query = db.query(FeatureFlag)
-    
-    if environment:
-        query = query.filter(FeatureFlag.environment == environment)
+    """
+    List all feature flags, optionally filtered by environment.
     
-    flags = query.offset(skip).limit(limit).all()
-    logger.info(f"Retrieved {len(flags)} flag(s)")
+    Flags are ordered by id, which is time-ordered (UUIDv7) for new flags.
+    When ``after_id`` is given the page starts after that cursor instead of
+    skipping ``skip`` rows.
+    """
+    logger.debug("Listing flags: environment=%s, skip=%s, limit=%s, after_id=%s", environment, skip, limit, after_id)
+    stmt = _paginate(
+        lambda_stmt(lambda: select(FeatureFlag)),
+        environment, skip, limit, after_id
+    )
+    flags = db.execute(stmt).scalars().all()
+    logger.info("Retrieved %s flag(s)", len(flags))
     return flags
 
 
+def list_flags_with_total(
+    db: Session,
+    environment: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[UUID] = None
+) -> Tuple[List[dict[str, Any]], int]:
+    """
+    List feature flag snapshots together with the total number of matching flags.
+    
+    Flags are returned as plain dicts (the same shape as cached snapshots)
+    loaded from a column projection rather than as ORM instances.
+    
+    The total is computed in the same query as the page: a window function
+    for offset pages, or a scalar subquery for keyset pages (where the cursor
+    filter would otherwise shrink the window).
+    """
+    logger.debug("Listing flags with total: environment=%s, skip=%s, limit=%s, after_id=%s", environment, skip, limit, after_id)
+    if after_id is None:
+        stmt = lambda_stmt(lambda: select(*_SNAPSHOT_COLUMNS, func.count().over().label("total")))
+    elif environment:
+        stmt = lambda_stmt(lambda: select(
+            *_SNAPSHOT_COLUMNS,
+            select(func.count())
+            .select_from(FeatureFlag)
+            .where(FeatureFlag.environment == environment)
+            .scalar_subquery()
+            .label("total")
+        ))
+    else:
+        stmt = lambda_stmt(lambda: select(
+            *_SNAPSHOT_COLUMNS,
+            select(func.count()).select_from(FeatureFlag).scalar_subquery().label("total")
+        ))
+    
+    stmt = _paginate(stmt, environment, skip, limit, after_id)
+    rows = db.execute(stmt).all()
+    # zip() stops before the trailing total column
+    flags = [dict(zip(_SNAPSHOT_FIELDS, row)) for row in rows]
+    if rows:
+        total = rows[0].total
+    elif skip or after_id is not None:
+        # Totals are only reported alongside rows, so a page past the end
+        # needs an explicit count.
+        total = count_flags(db, environment=environment)
+    else:
+        total = 0
+    
+    logger.info("Retrieved %s of %s flag(s)", len(flags), total)
+    return flags, total
+
+
 def count_flags(db: Session, environment: Optional[str] = None) -> int:
     """Count feature flags, optionally filtered by environment."""
-    query = db.query(FeatureFlag)
+    stmt = lambda_stmt(lambda: select(func.count()).select_from(FeatureFlag))
     
     if environment:
-        query = query.filter(FeatureFlag.environment == environment)
+        stmt += lambda s: s.where(FeatureFlag.environment == environment)
+    
+    return db.execute(stmt).scalar_one()
+
+
+# INSERT ... ON CONFLICT is dialect-specific in SQLAlchemy. The service runs
+# on PostgreSQL and the test suite on SQLite, so each gets its own construct.
+_INSERT_BY_DIALECT = {
+    "postgresql": pg_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def _insert_flag_stmt(dialect_name: str, flag_data: FeatureFlagCreate):
+    """
+    Build an INSERT for a new flag that skips duplicates.
     
-    return query.count()
+    A conflicting (name, environment) inserts nothing and returns no row, so
+    the insert and the duplicate check happen in a single statement.
+    """
+    return (
+        _INSERT_BY_DIALECT[dialect_name](FeatureFlag)
+        .values(
+            name=flag_data.name,
+            environment=flag_data.environment,
+            enabled=flag_data.enabled,
+            rollout=flag_data.rollout
+        )
+        .on_conflict_do_nothing(index_elements=["name", "environment"])
+        .returning(FeatureFlag)
+    )
 
 
 def create_flag(db: Session, flag_data: FeatureFlagCreate) -> FeatureFlag:
     """Create a new feature flag."""
-    logger.info(f"Creating flag: name={flag_data.name}, environment={flag_data.environment}")
+    logger.info("Creating flag: name=%s, environment=%s", flag_data.name, flag_data.environment)
     
-    # Check if flag already exists
-    existing = get_flag(db, flag_data.name, flag_data.environment)
-    if existing:
-        logger.warning(f"Attempted to create duplicate flag: {flag_data.name} in {flag_data.environment}")
-        raise FlagAlreadyExistsError(flag_data.name, flag_data.environment)
-    
-    flag = FeatureFlag(
-        name=flag_data.name,
-        environment=flag_data.environment,
-        enabled=flag_data.enabled,
-        rollout=flag_data.rollout
-    )
+    stmt = _insert_flag_stmt(db.get_bind().dialect.name, flag_data)
     
     try:
-        db.add(flag)
-        db.commit()
-        db.refresh(flag)
-        logger.info(f"Successfully created flag: {flag_data.name} in {flag_data.environment} (id={flag.id})")
-        return flag
+        flag = db.execute(stmt).scalar_one_or_none()
+        if flag is not None:
+            db.commit()
+            invalidate_flag(flag_data.name, flag_data.environment)
+            clear_flag_list_cache()
     except IntegrityError as e:
         db.rollback()
-        logger.error(f"Database integrity error creating flag: {e}")
+        logger.error("Database integrity error creating flag: %s", e)
         raise FlagAlreadyExistsError(flag_data.name, flag_data.environment)
     except Exception as e:
         db.rollback()
-        logger.error(f"Unexpected error creating flag: {e}", exc_info=True)
+        logger.error("Unexpected error creating flag: %s", e, exc_info=True)
         raise DatabaseError(f"Failed to create feature flag: {str(e)}")
+    
+    if flag is None:
+        db.rollback()
+        logger.warning("Attempted to create duplicate flag: %s in %s", flag_data.name, flag_data.environment)
+        raise FlagAlreadyExistsError(flag_data.name, flag_data.environment)
+    
+    logger.info("Successfully created flag: %s in %s (id=%s)", flag_data.name, flag_data.environment, flag.id)
+    return flag
 
 
 def update_flag(
@@ -95,57 +281,88 @@ def update_flag(
     environment: str, 
     flag_data: FeatureFlagUpdate
 ) -> Optional[FeatureFlag]:
-    """Update an existing feature flag."""
-    logger.info(f"Updating flag: name={name}, environment={environment}")
+    """
+    Update an existing feature flag.
     
-    flag = get_flag(db, name, environment)
-    if not flag:
-        logger.warning(f"Attempted to update non-existent flag: {name} in {environment}")
-        return None
+    A single UPDATE ... RETURNING applies the changes. It only matches the
+    row when a requested value differs, so an update that changes nothing
+    leaves the row and its updated_at untouched. When nothing matches, the
+    flag is read back from the database to tell a no-op from a missing flag.
+    """
+    logger.info("Updating flag: name=%s, environment=%s", name, environment)
     
-    # Track changes
-    changes = []
-    if flag_data.enabled is not None and flag_data.enabled != flag.enabled:
-        changes.append(f"enabled: {flag.enabled} -> {flag_data.enabled}")
-        flag.enabled = flag_data.enabled
-    if flag_data.rollout is not None and flag_data.rollout != flag.rollout:
-        changes.append(f"rollout: {flag.rollout} -> {flag_data.rollout}")
-        flag.rollout = flag_data.rollout
-    
-    if not changes:
-        logger.debug(f"No changes to apply for flag: {name} in {environment}")
-        return flag
+    changes = {}
+    if flag_data.enabled is not None:
+        changes["enabled"] = flag_data.enabled
+    if flag_data.rollout is not None:
+        changes["rollout"] = flag_data.rollout
     
-    try:
-        db.commit()
-        db.refresh(flag)
-        logger.info(f"Successfully updated flag: {name} in {environment} - Changes: {', '.join(changes)}")
+    flag = None
+    if changes:
+        stmt = (
+            update(FeatureFlag)
+            .where(
+                FeatureFlag.name == name,
+                FeatureFlag.environment == environment,
+                or_(*(getattr(FeatureFlag, field) != value for field, value in changes.items()))
+            )
+            .values(**changes)
+            .returning(FeatureFlag)
+        )
+        
+        try:
+            flag = db.execute(stmt).scalar_one_or_none()
+            if flag is not None:
+                db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            logger.error("Database integrity error updating flag: %s", e)
+            raise DatabaseError("Failed to update feature flag due to database constraint violation")
+        except Exception as e:
+            db.rollback()
+            logger.error("Unexpected error updating flag: %s", e, exc_info=True)
+            raise DatabaseError(f"Failed to update feature flag: {str(e)}")
+    
+    if flag is None:
+        # Read the current row rather than trusting the cache or identity map,
+        # which may predate writes from other processes
+        flag = db.execute(
+            select(FeatureFlag).where(FeatureFlag.name == name, FeatureFlag.environment == environment),
+            execution_options={"populate_existing": True}
+        ).scalar_one_or_none()
+        if not flag:
+            logger.warning("Attempted to update non-existent flag: %s in %s", name, environment)
+            return None
+        logger.debug("No changes to apply for flag: %s in %s", name, environment)
+        cache_flag(flag)
         return flag
-    except IntegrityError as e:
-        db.rollback()
-        logger.error(f"Database integrity error updating flag: {e}")
-        raise DatabaseError("Failed to update feature flag due to database constraint violation")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Unexpected error updating flag: {e}", exc_info=True)
-        raise DatabaseError(f"Failed to update feature flag: {str(e)}")
+    
+    # Replace the stale snapshot with the committed row
+    cache_flag(flag)
+    clear_flag_list_cache()
+    if logger.isEnabledFor(logging.INFO):
+        changes_str = ", ".join(f"{field}={value}" for field, value in changes.items())
+        logger.info("Successfully updated flag: %s in %s - Changes: %s", name, environment, changes_str)
+    return flag
 
 
 def delete_flag(db: Session, name: str, environment: str) -> bool:
     """Delete a feature flag."""
-    logger.info(f"Deleting flag: name={name}, environment={environment}")
+    logger.info("Deleting flag: name=%s, environment=%s", name, environment)
     
     flag = get_flag(db, name, environment)
     if not flag:
-        logger.warning(f"Attempted to delete non-existent flag: {name} in {environment}")
+        logger.warning("Attempted to delete non-existent flag: %s in %s", name, environment)
         return False
     
     try:
         db.delete(flag)
         db.commit()
-        logger.info(f"Successfully deleted flag: {name} in {environment} (id={flag.id})")
+        invalidate_flag(name, environment)
+        clear_flag_list_cache()
+        logger.info("Successfully deleted flag: %s in %s (id=%s)", name, environment, flag.id)
         return True
     except Exception as e:
         db.rollback()
-        logger.error(f"Error deleting flag: {e}", exc_info=True)
+        logger.error("Error deleting flag: %s", e, exc_info=True)
         raise DatabaseError(f"Failed to delete feature flag: {str(e)}")
@@ -6,9 +6,15 @@ from app.config import settings
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,  # Verify connections before using
-    pool_size=5,
-    max_overflow=10
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    # Compiled statement cache (default 500); sized so every query shape
+    # generated by the CRUD helpers stays compiled under load
+    query_cache_size=1200,
+    echo=False
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessions are request-scoped, so instances loaded via RETURNING stay valid
+# after commit without an extra SELECT to refresh them.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
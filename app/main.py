@@ -1,14 +1,17 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from typing import Optional
+from uuid import UUID
+from contextlib import asynccontextmanager
+import logging
 import time
 from app.database import SessionLocal, engine, Base
 from app.models import FeatureFlag
 from app.crud import (
-    get_flag,
-    list_flags,
-    count_flags,
+    get_flag_cached,
+    get_flags_bulk,
+    list_flags_with_total,
     create_flag,
     update_flag,
     delete_flag
@@ -17,7 +20,8 @@ from app.schemas import (
     FeatureFlagCreate,
     FeatureFlagUpdate,
     FeatureFlagResponse,
-    FeatureFlagListResponse
+    FeatureFlagListResponse,
+    FeatureFlagLookup
 )
 from app.exceptions import (
     FlagNotFoundError,
@@ -27,46 +31,70 @@ from app.exceptions import (
 )
 from app.logger import logger
 from app.auth import verify_api_key
+from app.responses import ORJSONResponse
+from app.cache import get_cached_flag_list, cache_flag_list
 
 # Note: Database tables are created via Alembic migrations
 # Run: alembic upgrade head
 # Base.metadata.create_all(bind=engine)  # Only for development, use Alembic in production
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Log database pool configuration on startup."""
+    logger.info("Database connection pool: %s", engine.pool.status())
+    yield
+
+
 app = FastAPI(
     title="FlagShip",
     description="Feature flag management service built with FastAPI and PostgreSQL",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all HTTP requests and responses."""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
-    # Log request
-    logger.info(
-        f"Request: {request.method} {request.url.path} - "
-        f"Client: {request.client.host if request.client else 'unknown'}"
-    )
+    # Skip building log arguments entirely when INFO is disabled (production)
+    log_info = logger.isEnabledFor(logging.INFO)
+    if log_info:
+        method = request.method
+        path = request.url.path
+        client = request.client
+        
+        # Log request
+        logger.info(
+            "Request: %s %s - Client: %s",
+            method,
+            path,
+            client.host if client else "unknown"
+        )
     
     try:
         response = await call_next(request)
-        process_time = time.time() - start_time
         
         # Log response
-        logger.info(
-            f"Response: {request.method} {request.url.path} - "
-            f"Status: {response.status_code} - "
-            f"Time: {process_time:.3f}s"
-        )
+        if log_info:
+            logger.info(
+                "Response: %s %s - Status: %s - Time: %.3fs",
+                method,
+                path,
+                response.status_code,
+                time.perf_counter() - start_time
+            )
         
         return response
     except Exception as e:
-        process_time = time.time() - start_time
+        process_time = time.perf_counter() - start_time
         logger.error(
-            f"Error processing {request.method} {request.url.path} - "
-            f"Time: {process_time:.3f}s - Error: {str(e)}",
+            "Error processing %s %s - Time: %.3fs - Error: %s",
+            request.method,
+            request.url.path,
+            process_time,
+            e,
             exc_info=True
         )
         raise
@@ -79,8 +107,8 @@ async def log_requests(request: Request, call_next):
 @app.exception_handler(DatabaseError)
 async def flagship_exception_handler(request: Request, exc: HTTPException):
     """Handle custom FlagShip exceptions."""
-    logger.warning(f"FlagShip exception: {exc.status_code} - {exc.detail}")
-    return JSONResponse(
+    logger.warning("FlagShip exception: %s - %s", exc.status_code, exc.detail)
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail, "status_code": exc.status_code}
     )
@@ -89,8 +117,8 @@ async def flagship_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle unexpected exceptions."""
-    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
+    return ORJSONResponse(
         status_code=500,
         content={"error": "Internal server error", "status_code": 500}
     )
@@ -105,19 +133,38 @@ def get_db():
         db.close()
 
 
-@app.get("/health")
-def health_check(db: Session = Depends(get_db)):
-    """Health check endpoint with database connectivity check."""
+# Probe results are reused for _DB_PROBE_INTERVAL seconds so frequent
+# liveness/readiness polling doesn't keep hitting the database.
+_DB_PROBE_INTERVAL = 5.0
+_last_probe: tuple[float, str] = (0.0, "unknown")
+
+
+def _database_status() -> str:
+    """Return the database connectivity status, re-checking it at most every few seconds."""
+    global _last_probe
+    checked_at, db_status = _last_probe
+    now = time.monotonic()
+    if db_status != "unknown" and now - checked_at < _DB_PROBE_INTERVAL:
+        return db_status
+    
     try:
-        # Test database connection
-        from sqlalchemy import text
-        db.execute(text("SELECT 1"))
+        # Use a bare connection; a Session is unnecessary for SELECT 1
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
         db_status = "connected"
         logger.debug("Health check: Database connection successful")
     except Exception as e:
         db_status = "disconnected"
-        logger.error(f"Health check: Database connection failed - {e}")
+        logger.error("Health check: Database connection failed - %s", e)
     
+    _last_probe = (now, db_status)
+    return db_status
+
+
+@app.get("/health")
+def health_check():
+    """Health check endpoint with database connectivity check."""
+    db_status = _database_status()
     status = "healthy" if db_status == "connected" else "degraded"
     
     return {
@@ -127,6 +174,25 @@ def health_check(db: Session = Depends(get_db)):
     }
 
 
+@app.get("/livez")
+async def liveness_check():
+    """Liveness probe; never touches the database."""
+    return {"status": "alive", "service": "FlagShip"}
+
+
+@app.get("/readyz")
+def readiness_check():
+    """Readiness probe; returns 503 while the database is unreachable."""
+    db_status = _database_status()
+    if db_status != "connected":
+        return ORJSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "service": "FlagShip", "database": db_status}
+        )
+    
+    return {"status": "ready", "service": "FlagShip", "database": db_status}
+
+
 @app.post("/flags", response_model=FeatureFlagResponse, status_code=201)
 def create_feature_flag(
     flag_data: FeatureFlagCreate,
@@ -141,7 +207,7 @@ def create_feature_flag(
         # These are already HTTPExceptions, just re-raise
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in create_feature_flag: {e}", exc_info=True)
+        logger.error("Unexpected error in create_feature_flag: %s", e, exc_info=True)
         raise DatabaseError(f"Failed to create feature flag: {str(e)}")
 
 
@@ -149,15 +215,48 @@ def create_feature_flag(
 def list_feature_flags(
     environment: Optional[str] = Query(None, description="Filter by environment"),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
-    limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    limit: int = Query(100, ge=1, le=500, description="Maximum number of records to return"),
+    after_id: Optional[UUID] = Query(None, description="Cursor (next_cursor) from the previous page; replaces skip"),
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_api_key)
 ):
     """List all feature flags, optionally filtered by environment."""
-    flags = list_flags(db, environment=environment, skip=skip, limit=limit)
-    total = count_flags(db, environment=environment)
+    # SDKs poll identical list queries; serve repeats as cached bytes
+    cache_key = (environment, skip, limit, after_id)
+    cached_body = get_cached_flag_list(cache_key)
+    if cached_body is not None:
+        return Response(content=cached_body, media_type="application/json")
     
-    return FeatureFlagListResponse(flags=flags, total=total)
+    flags, total = list_flags_with_total(
+        db,
+        environment=environment,
+        skip=skip,
+        limit=limit,
+        after_id=after_id
+    )
+    next_cursor = flags[-1]["id"] if len(flags) == limit else None
+    
+    # Rows come straight from the database, so skip response_model
+    # revalidation; the model still documents the response shape.
+    response = ORJSONResponse({
+        "flags": flags,
+        "total": total,
+        "next_cursor": next_cursor
+    })
+    cache_flag_list(cache_key, response.body)
+    return response
+
+
+@app.post("/flags/lookup", response_model=dict[str, FeatureFlagResponse])
+def lookup_feature_flags(
+    lookup: FeatureFlagLookup,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(verify_api_key)
+):
+    """Get several feature flags from one environment in a single request, keyed by name."""
+    flags = get_flags_bulk(db, lookup.environment, lookup.names)
+    # Snapshots are trusted data; skip response_model revalidation
+    return ORJSONResponse(flags)
 
 
 @app.get("/flags/{name}", response_model=FeatureFlagResponse)
@@ -168,10 +267,11 @@ def fetch_feature_flag(
     api_key: str = Depends(verify_api_key)
 ):
     """Get a specific feature flag by name and environment."""
-    flag = get_flag(db, name, environment)
+    flag = get_flag_cached(db, name, environment)
     if not flag:
         raise FlagNotFoundError(name, environment)
-    return flag
+    # Cached snapshots are trusted data; skip response_model revalidation
+    return ORJSONResponse(flag)
 
 
 @app.put("/flags/{name}", response_model=FeatureFlagResponse)
@@ -192,7 +292,7 @@ def update_feature_flag(
         # These are already HTTPExceptions, just re-raise
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in update_feature_flag: {e}", exc_info=True)
+        logger.error("Unexpected error in update_feature_flag: %s", e, exc_info=True)
         raise DatabaseError(f"Failed to update feature flag: {str(e)}")
 
 
@@ -213,5 +313,5 @@ def delete_feature_flag(
         # These are already HTTPExceptions, just re-raise
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in delete_feature_flag: {e}", exc_info=True)
+        logger.error("Unexpected error in delete_feature_flag: %s", e, exc_info=True)
         raise DatabaseError(f"Failed to delete feature flag: {str(e)}")
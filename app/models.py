@@ -1,22 +1,32 @@
-from sqlalchemy import Column, String, Boolean, Integer, DateTime, UniqueConstraint
+from sqlalchemy import Column, String, Boolean, Integer, DateTime, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from datetime import datetime
-import uuid
 from app.database import Base
 
+try:
+    from uuid import uuid7
+except ImportError:  # Python < 3.14
+    from uuid_extensions import uuid7
+
 
 class FeatureFlag(Base):
     __tablename__ = "feature_flags"
     
-    # Unique constraint on name + environment combination
+    # Unique constraint on name + environment combination; its index also
+    # serves lookups by name and environment (get_flag).
+    # ix_feature_flags_environment_id serves list_flags, which filters by
+    # environment and pages in id order.
     __table_args__ = (
         UniqueConstraint('name', 'environment', name='uq_flag_name_environment'),
+        Index('ix_feature_flags_environment_id', 'environment', 'id'),
     )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    name = Column(String(100), nullable=False, index=True)
-    environment = Column(String(50), nullable=False, index=True)
+    # UUIDv7 ids are time-ordered, so inserts append to the right edge of the
+    # primary key index and id order follows creation order
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    name = Column(String(100), nullable=False)
+    environment = Column(String(50), nullable=False)
     enabled = Column(Boolean, default=False, nullable=False)
     rollout = Column(Integer, default=100, nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,20 @@
+"""
+Response classes for FlagShip.
+Provides an orjson-backed JSON response for payloads built by hand.
+"""
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response serialized with orjson.
+    
+    orjson is much faster than the stdlib json module and encodes UUID and
+    datetime values natively. Endpoints with a response_model don't need it:
+    FastAPI already serializes those straight to JSON bytes via Pydantic, and
+    setting a custom default_response_class would disable that fast path.
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
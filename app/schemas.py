@@ -1,8 +1,21 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional
 from datetime import datetime
 from uuid import UUID
 
+# Built once at import time rather than on every validation
+_ALLOWED_ENVIRONMENTS = ('dev', 'staging', 'prod', 'development', 'production')
+_ALLOWED_ENVIRONMENTS_SET = frozenset(_ALLOWED_ENVIRONMENTS)
+_ALLOWED_ENVIRONMENTS_MSG = f"Environment must be one of: {', '.join(_ALLOWED_ENVIRONMENTS)}"
+
+
+def _normalize_environment(v: str) -> str:
+    """Lowercase an environment name and check it is allowed."""
+    v = v.lower()
+    if v not in _ALLOWED_ENVIRONMENTS_SET:
+        raise ValueError(_ALLOWED_ENVIRONMENTS_MSG)
+    return v
+
 
 class FeatureFlagBase(BaseModel):
     """Base schema for feature flag with common fields."""
@@ -11,13 +24,11 @@ class FeatureFlagBase(BaseModel):
     enabled: bool = Field(default=False, description="Whether the flag is enabled")
     rollout: int = Field(default=100, ge=0, le=100, description="Rollout percentage (0-100)")
     
-    @validator('environment')
+    @field_validator('environment')
+    @classmethod
     def validate_environment(cls, v):
         """Validate environment value."""
-        allowed = ['dev', 'staging', 'prod', 'development', 'production']
-        if v.lower() not in allowed:
-            raise ValueError(f"Environment must be one of: {', '.join(allowed)}")
-        return v.lower()
+        return _normalize_environment(v)
 
 
 class FeatureFlagCreate(FeatureFlagBase):
@@ -30,7 +41,8 @@ class FeatureFlagUpdate(BaseModel):
     enabled: Optional[bool] = Field(None, description="Whether the flag is enabled")
     rollout: Optional[int] = Field(None, ge=0, le=100, description="Rollout percentage (0-100)")
     
-    @validator('rollout')
+    @field_validator('rollout')
+    @classmethod
     def validate_rollout(cls, v):
         """Validate rollout percentage."""
         if v is not None and (v < 0 or v > 100):
@@ -40,14 +52,29 @@ class FeatureFlagUpdate(BaseModel):
 
 class FeatureFlagResponse(FeatureFlagBase):
     """Schema for feature flag response."""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: UUID
     updated_at: datetime
-    
-    class Config:
-        from_attributes = True
 
 
 class FeatureFlagListResponse(BaseModel):
     """Schema for list of feature flags."""
     flags: list[FeatureFlagResponse]
     total: int
+    next_cursor: Optional[UUID] = Field(
+        None,
+        description="ID of the last flag on a full page; pass as after_id to fetch the next page"
+    )
+
+
+class FeatureFlagLookup(BaseModel):
+    """Schema for fetching several feature flags from one environment."""
+    environment: str = Field(..., min_length=1, max_length=50, description="Environment (dev, staging, prod)")
+    names: list[str] = Field(..., min_length=1, max_length=500, description="Feature flag names to fetch")
+    
+    @field_validator('environment')
+    @classmethod
+    def validate_environment(cls, v):
+        """Validate environment value."""
+        return _normalize_environment(v)
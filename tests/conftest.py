@@ -1,56 +1,183 @@
 """
 Pytest configuration and fixtures for FlagShip tests.
 """
+from contextlib import contextmanager
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
 from app.database import Base
-from app.main import app, get_db
-from app.config import settings
+from app.models import FeatureFlag
+from app.cache import clear_flag_cache
 
 
-# Use in-memory SQLite for testing (faster than PostgreSQL)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# Use in-memory SQLite for testing (faster than PostgreSQL). Each
+# pytest-xdist worker is its own process, so workers never share a database.
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
+# Sessions join the per-test outer transaction and turn their own commits
+# and rollbacks into SAVEPOINTs, so application code can commit freely.
+TestingSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    join_transaction_mode="create_savepoint"
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Session bound to the current test under "db"; read by the get_db override,
+# which is registered once for the whole test session
+_current_session: dict = {}
 
-@pytest.fixture(scope="function")
-def db_session():
-    """Create a fresh database session for each test."""
-    # Create tables
+
+def override_get_db():
+    """Yield the current test's database session."""
+    yield _current_session.get("db")
+
+
+@contextmanager
+def _bind_session(db):
+    """Serve db to requests until exit, then restore any outer binding."""
+    outer = _current_session.pop("db", None)
+    if db is not None:
+        _current_session["db"] = db
+    try:
+        yield
+    finally:
+        _current_session.pop("db", None)
+        if outer is not None:
+            _current_session["db"] = outer
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """Create the test engine once per test session."""
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        # Every checkout shares the one connection holding the in-memory database
+        poolclass=StaticPool,
+        # Match the application engine so compiled statements stay cached
+        # across the whole suite
+        query_cache_size=1200
+    )
+    
+    # pysqlite's own transaction handling breaks SAVEPOINTs; let SQLAlchemy
+    # emit BEGIN itself instead
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    
+    @event.listens_for(engine, "begin")
+    def _begin_transaction(connection):
+        connection.exec_driver_sql("BEGIN")
+    
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _schema(engine):
+    """Create the tables once per test session."""
     Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db_session(engine):
+    """Create a database session whose changes are rolled back after each test."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = TestingSessionLocal(bind=connection)
+    # Cached flags would outlive the rolled back rows
+    clear_flag_cache()
     
-    # Create session
-    db = TestingSessionLocal()
     try:
-        yield db
+        with _bind_session(db):
+            yield db
     finally:
         db.close()
-        # Drop tables after test
-        Base.metadata.drop_all(bind=engine)
+        transaction.rollback()
+        connection.close()
 
 
-@pytest.fixture(scope="function")
-def client(db_session):
-    """Create a test client with database dependency override."""
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
-    
-    app.dependency_overrides[get_db] = override_get_db
+@pytest.fixture
+def seed_flags(db_session):
+    """Insert flags directly in one commit, skipping the CRUD layer."""
+    def _seed_flags(rows):
+        db_session.bulk_save_objects([FeatureFlag(**row) for row in rows])
+        db_session.commit()
     
-    with TestClient(app) as test_client:
-        yield test_client
+    return _seed_flags
+
+
+@pytest.fixture(scope="module")
+def db_session_module(engine):
+    """Database session shared by a module's tests that never write."""
+    db = TestingSessionLocal(bind=engine)
+    try:
+        with _bind_session(db):
+            yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="session")
+def probe_engine():
+    """Engine for health probes.
+
+    The test engine's single connection is held by the running test's
+    transaction, so probes check a separate in-memory database.
+    """
+    probe_engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    yield probe_engine
+    probe_engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def fastapi_app():
+    """The FastAPI application, imported only once a test needs it."""
+    from app.main import app
+    return app
+
+
+@pytest.fixture(scope="session")
+def _test_client(fastapi_app, probe_engine):
+    """Start the application once per test session."""
+    from app import main
     
-    app.dependency_overrides.clear()
+    fastapi_app.dependency_overrides[main.get_db] = override_get_db
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "engine", probe_engine)
+        with TestClient(fastapi_app) as test_client:
+            yield test_client
+    fastapi_app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+def client(_test_client, db_session):
+    """Test client whose requests use the current test's database session."""
+    return _test_client
+
+
+@pytest.fixture
+def client_no_db(_test_client):
+    """Test client for requests rejected before reaching the database.
+
+    No session is bound, so a request that does use the database fails.
+    """
+    with _bind_session(None):
+        yield _test_client
+
+
+@pytest.fixture(scope="module")
+def client_module(_test_client, db_session_module):
+    """Test client shared by a module's read-only tests."""
+    return _test_client
 
 
 @pytest.fixture
@@ -74,4 +201,3 @@ def api_key():
 def auth_headers(api_key):
     """Headers with API key for authenticated requests."""
     return {"X-API-Key": api_key}
-
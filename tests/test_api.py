@@ -2,12 +2,13 @@
 Tests for API endpoints.
 """
 import pytest
-from app.schemas import FeatureFlagCreate
+from app.models import FeatureFlag
+from app.schemas import FeatureFlagResponse
 
 
-def test_health_check(client):
+def test_health_check(client_module):
     """Test health check endpoint."""
-    response = client.get("/health")
+    response = client_module.get("/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] in ["healthy", "degraded"]
@@ -15,17 +16,43 @@ def test_health_check(client):
     assert "database" in data
 
 
+def test_liveness_check(client_module):
+    """Test liveness probe endpoint."""
+    response = client_module.get("/livez")
+    assert response.status_code == 200
+    assert response.json()["status"] == "alive"
+
+
+def test_readiness_check(client):
+    """Test readiness probe endpoint."""
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["database"] == "connected"
+
+
+def test_readiness_check_database_down(client, monkeypatch):
+    """Test that readiness fails while the database is unreachable."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+    from app import main
+    
+    broken_engine = create_engine("sqlite:////nonexistent/dir/flags.db", poolclass=NullPool)
+    monkeypatch.setattr(main, "engine", broken_engine)
+    monkeypatch.setattr(main, "_last_probe", (0.0, "unknown"))
+    
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["database"] == "disconnected"
+
+
 def test_create_flag(client, sample_flag_data, auth_headers):
     """Test creating a feature flag via API."""
     response = client.post("/flags", json=sample_flag_data, headers=auth_headers)
     assert response.status_code == 201
-    data = response.json()
-    assert data["name"] == sample_flag_data["name"]
-    assert data["environment"] == sample_flag_data["environment"]
-    assert data["enabled"] == sample_flag_data["enabled"]
-    assert data["rollout"] == sample_flag_data["rollout"]
-    assert "id" in data
-    assert "updated_at" in data
+    flag = FeatureFlagResponse(**response.json())
+    assert flag.model_dump(exclude={"id", "updated_at"}) == sample_flag_data
 
 
 def test_create_duplicate_flag(client, sample_flag_data, auth_headers):
@@ -40,18 +67,27 @@ def test_create_duplicate_flag(client, sample_flag_data, auth_headers):
 
 def test_create_flag_invalid_rollout(client, sample_flag_data, auth_headers):
     """Test creating a flag with invalid rollout value."""
-    invalid_data = sample_flag_data.copy()
-    invalid_data["rollout"] = 150  # Invalid: > 100
+    invalid_data = {**sample_flag_data, "rollout": 150}  # Invalid: > 100
     
     response = client.post("/flags", json=invalid_data, headers=auth_headers)
     assert response.status_code == 422  # Validation error
 
 
+def test_create_flag_environment_validation(client, sample_flag_data, auth_headers):
+    """Test that environments are normalized to lowercase and checked."""
+    response = client.post("/flags", json={**sample_flag_data, "environment": "PROD"}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json()["environment"] == "prod"
+    
+    response = client.post("/flags", json={**sample_flag_data, "environment": "qa"}, headers=auth_headers)
+    assert response.status_code == 422
+    assert "environment must be one of" in response.text.lower()
+
+
 def test_get_flag(client, sample_flag_data, auth_headers):
     """Test getting a specific flag."""
     # Create flag first
-    create_response = client.post("/flags", json=sample_flag_data, headers=auth_headers)
-    assert create_response.status_code == 201
+    client.post("/flags", json=sample_flag_data, headers=auth_headers)
     
     # Get the flag
     response = client.get(
@@ -60,9 +96,8 @@ def test_get_flag(client, sample_flag_data, auth_headers):
         headers=auth_headers
     )
     assert response.status_code == 200
-    data = response.json()
-    assert data["name"] == sample_flag_data["name"]
-    assert data["environment"] == sample_flag_data["environment"]
+    flag = FeatureFlagResponse(**response.json())
+    assert flag.model_dump(exclude={"id", "updated_at"}) == sample_flag_data
 
 
 def test_get_nonexistent_flag(client, auth_headers):
@@ -91,34 +126,51 @@ def test_list_flags(client, sample_flag_data, auth_headers):
     assert data["total"] >= 1
 
 
+def test_list_flags_reflects_writes(client, sample_flag_data, auth_headers):
+    """Test that cached list responses are dropped when flags change."""
+    client.post("/flags", json=sample_flag_data, headers=auth_headers)
+    assert client.get("/flags", headers=auth_headers).json()["total"] == 1
+    
+    client.post("/flags", json={**sample_flag_data, "name": "other_feature"}, headers=auth_headers)
+    assert client.get("/flags", headers=auth_headers).json()["total"] == 2
+    
+    client.put(
+        f"/flags/{sample_flag_data['name']}",
+        params={"environment": sample_flag_data["environment"]},
+        json={"rollout": 10},
+        headers=auth_headers
+    )
+    data = client.get("/flags", headers=auth_headers).json()
+    assert {flag["name"]: flag["rollout"] for flag in data["flags"]}[sample_flag_data["name"]] == 10
+    
+    client.delete(
+        "/flags/other_feature",
+        params={"environment": sample_flag_data["environment"]},
+        headers=auth_headers
+    )
+    assert client.get("/flags", headers=auth_headers).json()["total"] == 1
+
+
 def test_list_flags_filtered(client, sample_flag_data, auth_headers):
     """Test listing flags filtered by environment."""
     # Create flags in different environments
-    dev_flag = sample_flag_data.copy()
-    staging_flag = sample_flag_data.copy()
-    staging_flag["environment"] = "staging"
-    
-    client.post("/flags", json=dev_flag, headers=auth_headers)
-    client.post("/flags", json=staging_flag, headers=auth_headers)
+    client.post("/flags", json=sample_flag_data, headers=auth_headers)
+    client.post("/flags", json={**sample_flag_data, "environment": "staging"}, headers=auth_headers)
     
     # List dev flags only
     response = client.get("/flags", params={"environment": "dev"}, headers=auth_headers)
     assert response.status_code == 200
     data = response.json()
-    assert all(flag["environment"] == "dev" for flag in data["flags"])
+    assert {flag["environment"] for flag in data["flags"]} == {"dev"}
 
 
-def test_list_flags_pagination(client, auth_headers):
+def test_list_flags_pagination(client, seed_flags, auth_headers):
     """Test pagination in list endpoint."""
     # Create multiple flags
-    for i in range(5):
-        flag_data = {
-            "name": f"flag{i}",
-            "environment": "dev",
-            "enabled": True,
-            "rollout": 100
-        }
-        client.post("/flags", json=flag_data, headers=auth_headers)
+    seed_flags(
+        {"name": f"flag{i}", "environment": "dev", "enabled": True, "rollout": 100}
+        for i in range(5)
+    )
     
     # Test pagination
     response = client.get("/flags", params={"skip": 0, "limit": 2}, headers=auth_headers)
@@ -127,11 +179,54 @@ def test_list_flags_pagination(client, auth_headers):
     assert len(data["flags"]) == 2
 
 
+def test_list_flags_cursor_pagination(client, seed_flags, auth_headers):
+    """Test paging through flags with next_cursor."""
+    seed_flags(
+        {"name": f"flag{i}", "environment": "dev", "enabled": True, "rollout": 100}
+        for i in range(5)
+    )
+    
+    params = {"environment": "dev", "limit": 2}
+    names = []
+    while True:
+        response = client.get("/flags", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 5
+        names.extend(flag["name"] for flag in data["flags"])
+        if data["next_cursor"] is None:
+            break
+        params["after_id"] = data["next_cursor"]
+    
+    assert sorted(names) == [f"flag{i}" for i in range(5)]
+
+
+def test_lookup_flags(client, sample_flag_data, auth_headers):
+    """Test fetching several flags in one request."""
+    client.post("/flags", json=sample_flag_data, headers=auth_headers)
+    client.post("/flags", json={**sample_flag_data, "name": "other_feature"}, headers=auth_headers)
+    
+    response = client.post(
+        "/flags/lookup",
+        json={"environment": "dev", "names": ["test_feature", "other_feature", "nonexistent"]},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"test_feature", "other_feature"}
+    assert data["test_feature"]["rollout"] == sample_flag_data["rollout"]
+
+
+def test_lookup_flags_requires_names(client, auth_headers):
+    """Test that a lookup needs at least one name."""
+    response = client.post("/flags/lookup", json={"environment": "dev", "names": []}, headers=auth_headers)
+    assert response.status_code == 422
+
+
 def test_update_flag(client, sample_flag_data, auth_headers):
     """Test updating a feature flag."""
     # Create flag first
-    create_response = client.post("/flags", json=sample_flag_data, headers=auth_headers)
-    assert create_response.status_code == 201
+    client.post("/flags", json=sample_flag_data, headers=auth_headers)
     
     # Update the flag
     update_data = {"enabled": False, "rollout": 50}
@@ -142,9 +237,22 @@ def test_update_flag(client, sample_flag_data, auth_headers):
         headers=auth_headers
     )
     assert response.status_code == 200
-    data = response.json()
-    assert data["enabled"] is False
-    assert data["rollout"] == 50
+    flag = FeatureFlagResponse(**response.json())
+    assert flag.model_dump(exclude={"id", "updated_at"}) == {**sample_flag_data, **update_data}
+
+
+def test_get_flag_after_update(client, sample_flag_data, auth_headers):
+    """Test that reads see updates despite flag caching."""
+    client.post("/flags", json=sample_flag_data, headers=auth_headers)
+    url = f"/flags/{sample_flag_data['name']}"
+    params = {"environment": sample_flag_data["environment"]}
+    
+    assert client.get(url, params=params, headers=auth_headers).json()["rollout"] == 100
+    client.put(url, params=params, json={"rollout": 25}, headers=auth_headers)
+    
+    response = client.get(url, params=params, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["rollout"] == 25
 
 
 def test_update_nonexistent_flag(client, auth_headers):
@@ -159,7 +267,7 @@ def test_update_nonexistent_flag(client, auth_headers):
     assert response.status_code == 404
 
 
-def test_delete_flag(client, sample_flag_data, auth_headers):
+def test_delete_flag(client, db_session, sample_flag_data, auth_headers):
     """Test deleting a feature flag."""
     # Create flag first
     client.post("/flags", json=sample_flag_data, headers=auth_headers)
@@ -173,12 +281,11 @@ def test_delete_flag(client, sample_flag_data, auth_headers):
     assert response.status_code == 204
     
     # Verify it's deleted
-    get_response = client.get(
-        f"/flags/{sample_flag_data['name']}",
-        params={"environment": sample_flag_data["environment"]},
-        headers=auth_headers
-    )
-    assert get_response.status_code == 404
+    remaining = db_session.query(FeatureFlag).filter_by(
+        name=sample_flag_data["name"],
+        environment=sample_flag_data["environment"]
+    ).first()
+    assert remaining is None
 
 
 def test_delete_nonexistent_flag(client, auth_headers):
@@ -4,23 +4,23 @@ Tests for authentication.
 import pytest
 
 
-def test_health_check_no_auth(client):
+def test_health_check_no_auth(client_module):
     """Test that health check doesn't require authentication."""
-    response = client.get("/health")
+    response = client_module.get("/health")
     assert response.status_code == 200
 
 
-def test_protected_endpoint_without_api_key(client, sample_flag_data):
+def test_protected_endpoint_without_api_key(client_no_db, sample_flag_data):
     """Test that protected endpoints require API key."""
-    response = client.post("/flags", json=sample_flag_data)
+    response = client_no_db.post("/flags", json=sample_flag_data)
     assert response.status_code == 401
     assert "api key" in response.json()["detail"].lower()
 
 
-def test_protected_endpoint_with_invalid_api_key(client, sample_flag_data, auth_headers):
+def test_protected_endpoint_with_invalid_api_key(client_no_db, sample_flag_data, auth_headers):
     """Test that invalid API keys are rejected."""
     invalid_headers = {"X-API-Key": "invalid-key"}
-    response = client.post("/flags", json=sample_flag_data, headers=invalid_headers)
+    response = client_no_db.post("/flags", json=sample_flag_data, headers=invalid_headers)
     assert response.status_code == 401
     assert "invalid" in response.json()["detail"].lower()
 
@@ -30,3 +30,37 @@ def test_protected_endpoint_with_valid_api_key(client, sample_flag_data, auth_he
     response = client.post("/flags", json=sample_flag_data, headers=auth_headers)
     assert response.status_code == 201
 
+
+
+def test_revoked_api_key_rejected_immediately(monkeypatch):
+    """Test that a key removed from settings stops verifying without any grace period."""
+    from fastapi import HTTPException
+    from app.auth import verify_api_key, get_api_keys
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "API_KEYS", "key-a")
+    get_api_keys.cache_clear()
+    try:
+        assert verify_api_key("key-a") == "key-a"
+        
+        monkeypatch.setattr(settings, "API_KEYS", "key-b")
+        get_api_keys.cache_clear()
+        with pytest.raises(HTTPException):
+            verify_api_key("key-a")
+    finally:
+        monkeypatch.undo()
+        get_api_keys.cache_clear()
+
+
+def test_api_keys_parsed_from_settings(monkeypatch):
+    """Test that API keys are parsed into a set of digests and re-read after cache_clear."""
+    from app.auth import get_api_keys, hash_api_key
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "API_KEYS", " key-a, key-b ,,")
+    get_api_keys.cache_clear()
+    try:
+        assert get_api_keys() == frozenset({hash_api_key("key-a"), hash_api_key("key-b")})
+    finally:
+        monkeypatch.undo()
+        get_api_keys.cache_clear()
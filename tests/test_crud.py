@@ -2,44 +2,74 @@
 Tests for CRUD operations.
 """
 import pytest
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql
 from app.crud import (
     create_flag,
     get_flag,
+    get_flag_cached,
+    get_flags_bulk,
     list_flags,
+    list_flags_with_total,
     count_flags,
     update_flag,
-    delete_flag
+    delete_flag,
+    _insert_flag_stmt
 )
+from app.models import FeatureFlag
 from app.schemas import FeatureFlagCreate, FeatureFlagUpdate
 from app.exceptions import FlagAlreadyExistsError, DatabaseError
 
 
-def test_create_flag(db_session, sample_flag_data):
+# Built once; matches the sample_flag_data fixture
+_SAMPLE_CREATE = FeatureFlagCreate(name="test_feature", environment="dev", enabled=True, rollout=100)
+
+# Flags across two environments for the list and count tests
+_SEED_FLAGS = (
+    {"name": "flag1", "environment": "dev", "enabled": True, "rollout": 100},
+    {"name": "flag2", "environment": "dev", "enabled": False, "rollout": 50},
+    {"name": "flag1", "environment": "staging", "enabled": True, "rollout": 75},
+)
+
+
+@pytest.fixture(scope="module")
+def sample_flag_create():
+    """Validated create payload for the sample flag."""
+    return _SAMPLE_CREATE
+
+
+def test_create_flag(db_session, sample_flag_create, sample_flag_data):
     """Test creating a feature flag."""
-    flag_data = FeatureFlagCreate(**sample_flag_data)
-    flag = create_flag(db_session, flag_data)
+    flag = create_flag(db_session, sample_flag_create)
     
     assert flag.name == sample_flag_data["name"]
     assert flag.environment == sample_flag_data["environment"]
     assert flag.enabled == sample_flag_data["enabled"]
     assert flag.rollout == sample_flag_data["rollout"]
     assert flag.id is not None
+    assert flag.id.version == 7
 
 
-def test_create_duplicate_flag(db_session, sample_flag_data):
+def test_create_flag_postgresql_statement(sample_flag_create):
+    """Test the INSERT that create_flag issues on PostgreSQL."""
+    sql = str(_insert_flag_stmt("postgresql", sample_flag_create).compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (name, environment) DO NOTHING" in sql
+    assert "RETURNING feature_flags.id" in sql
+
+
+def test_create_duplicate_flag(db_session, sample_flag_create):
     """Test that creating a duplicate flag raises an error."""
-    flag_data = FeatureFlagCreate(**sample_flag_data)
-    create_flag(db_session, flag_data)
+    create_flag(db_session, sample_flag_create)
     
     # Try to create duplicate
     with pytest.raises(FlagAlreadyExistsError):
-        create_flag(db_session, flag_data)
+        create_flag(db_session, sample_flag_create)
 
 
-def test_get_flag(db_session, sample_flag_data):
+def test_get_flag(db_session, sample_flag_create, sample_flag_data):
     """Test getting a feature flag."""
-    flag_data = FeatureFlagCreate(**sample_flag_data)
-    created_flag = create_flag(db_session, flag_data)
+    created_flag = create_flag(db_session, sample_flag_create)
     
     retrieved_flag = get_flag(db_session, sample_flag_data["name"], sample_flag_data["environment"])
     
@@ -54,17 +84,50 @@ def test_get_nonexistent_flag(db_session):
     assert flag is None
 
 
-def test_list_flags(db_session):
+def test_get_flag_cached(db_session, sample_flag_create, sample_flag_data):
+    """Test that flag reads are cached and kept in sync with updates."""
+    created_flag = create_flag(db_session, sample_flag_create)
+    name, environment = sample_flag_data["name"], sample_flag_data["environment"]
+    
+    snapshot = get_flag_cached(db_session, name, environment)
+    assert snapshot["id"] == created_flag.id
+    assert snapshot["enabled"] is True
+    
+    db_session.close()  # any database access now would start a new transaction
+    assert get_flag_cached(db_session, name, environment) == snapshot
+    assert not db_session.in_transaction()
+    
+    update_flag(db_session, name, environment, FeatureFlagUpdate(enabled=False))
+    assert get_flag_cached(db_session, name, environment)["enabled"] is False
+    
+    delete_flag(db_session, name, environment)
+    assert get_flag_cached(db_session, name, environment) is None
+
+
+def test_get_flags_bulk(db_session):
+    """Test fetching several flags in one call."""
+    for name in ("flag1", "flag2", "flag3"):
+        create_flag(db_session, FeatureFlagCreate(name=name, environment="dev", enabled=True, rollout=100))
+    create_flag(db_session, FeatureFlagCreate(name="flag1", environment="staging", enabled=False, rollout=0))
+    
+    # Warm the cache for one name; the rest come from a single query
+    get_flag_cached(db_session, "flag1", "dev")
+    flags = get_flags_bulk(db_session, "dev", ["flag1", "flag2", "missing", "flag2"])
+    
+    assert set(flags) == {"flag1", "flag2"}
+    assert flags["flag1"]["environment"] == "dev"
+    assert flags["flag1"]["enabled"] is True
+    
+    # Fetched flags are cached
+    db_session.close()
+    assert get_flags_bulk(db_session, "dev", ["flag2"]) == {"flag2": flags["flag2"]}
+    assert not db_session.in_transaction()
+
+
+def test_list_flags(db_session, seed_flags):
     """Test listing all flags."""
     # Create multiple flags
-    flags_data = [
-        {"name": "flag1", "environment": "dev", "enabled": True, "rollout": 100},
-        {"name": "flag2", "environment": "dev", "enabled": False, "rollout": 50},
-        {"name": "flag1", "environment": "staging", "enabled": True, "rollout": 75},
-    ]
-    
-    for flag_data in flags_data:
-        create_flag(db_session, FeatureFlagCreate(**flag_data))
+    seed_flags(_SEED_FLAGS)
     
     # List all flags
     all_flags = list_flags(db_session)
@@ -78,40 +141,43 @@ def test_list_flags(db_session):
     assert len(staging_flags) == 1
 
 
-def test_list_flags_pagination(db_session):
+@pytest.mark.parametrize("skip,expected", [(0, 2), (2, 2), (4, 1)])
+def test_list_flags_pagination(db_session, seed_flags, skip, expected):
     """Test pagination in list_flags."""
     # Create 5 flags
-    for i in range(5):
-        flag_data = FeatureFlagCreate(
-            name=f"flag{i}",
-            environment="dev",
-            enabled=True,
-            rollout=100
-        )
-        create_flag(db_session, flag_data)
-    
-    # Test pagination
-    flags = list_flags(db_session, skip=0, limit=2)
-    assert len(flags) == 2
+    seed_flags(
+        {"name": f"flag{i}", "environment": "dev", "enabled": True, "rollout": 100}
+        for i in range(5)
+    )
     
-    flags = list_flags(db_session, skip=2, limit=2)
-    assert len(flags) == 2
+    flags = list_flags(db_session, skip=skip, limit=2)
+    assert len(flags) == expected
+
+
+def test_list_flags_keyset_pagination(db_session, seed_flags):
+    """Test cursor-based pagination in list_flags."""
+    seed_flags(
+        {"name": f"flag{i}", "environment": "dev" if i % 2 else "staging", "enabled": True, "rollout": 100}
+        for i in range(5)
+    )
     
-    flags = list_flags(db_session, skip=4, limit=2)
-    assert len(flags) == 1
+    seen = []
+    page = list_flags(db_session, limit=2)
+    while page:
+        seen.extend(page)
+        page = list_flags(db_session, limit=2, after_id=page[-1].id)
+    
+    assert len(seen) == 5
+    assert [flag.id for flag in seen] == sorted(flag.id for flag in seen)
+    
+    dev_flags = list_flags(db_session, environment="dev", limit=10, after_id=seen[0].id)
+    assert {flag.name for flag in dev_flags} == {"flag1", "flag3"} - {seen[0].name}
 
 
-def test_count_flags(db_session):
+def test_count_flags(db_session, seed_flags):
     """Test counting flags."""
     # Create flags in different environments
-    flags_data = [
-        {"name": "flag1", "environment": "dev", "enabled": True, "rollout": 100},
-        {"name": "flag2", "environment": "dev", "enabled": False, "rollout": 50},
-        {"name": "flag1", "environment": "staging", "enabled": True, "rollout": 75},
-    ]
-    
-    for flag_data in flags_data:
-        create_flag(db_session, FeatureFlagCreate(**flag_data))
+    seed_flags(_SEED_FLAGS)
     
     # Count all flags
     total = count_flags(db_session)
@@ -125,10 +191,30 @@ def test_count_flags(db_session):
     assert staging_count == 1
 
 
-def test_update_flag(db_session, sample_flag_data):
+def test_list_flags_with_total(db_session, seed_flags):
+    """Test listing a page of flags together with the total count."""
+    seed_flags(
+        {"name": f"flag{i}", "environment": "dev" if i < 3 else "staging", "enabled": True, "rollout": 100}
+        for i in range(5)
+    )
+    
+    flags, total = list_flags_with_total(db_session, skip=0, limit=2)
+    assert len(flags) == 2
+    assert total == 5
+    
+    flags, total = list_flags_with_total(db_session, environment="dev", skip=0, limit=10)
+    assert len(flags) == 3
+    assert total == 3
+    
+    # Page past the end still reports the total
+    flags, total = list_flags_with_total(db_session, skip=10, limit=2)
+    assert flags == []
+    assert total == 5
+
+
+def test_update_flag(db_session, sample_flag_create, sample_flag_data):
     """Test updating a feature flag."""
-    flag_data = FeatureFlagCreate(**sample_flag_data)
-    created_flag = create_flag(db_session, flag_data)
+    created_flag = create_flag(db_session, sample_flag_create)
     
     # Update the flag
     update_data = FeatureFlagUpdate(enabled=False, rollout=50)
@@ -152,10 +238,37 @@ def test_update_nonexistent_flag(db_session):
     assert result is None
 
 
-def test_delete_flag(db_session, sample_flag_data):
+def test_update_flag_noop_keeps_updated_at(db_session, sample_flag_create, sample_flag_data):
+    """Test that an update matching the stored values leaves the row untouched."""
+    created_flag = create_flag(db_session, sample_flag_create)
+    past = datetime(2020, 1, 1)
+    db_session.execute(update(FeatureFlag).where(FeatureFlag.id == created_flag.id).values(updated_at=past))
+    db_session.commit()
+    
+    update_data = FeatureFlagUpdate(enabled=sample_flag_data["enabled"], rollout=sample_flag_data["rollout"])
+    result = update_flag(db_session, sample_flag_data["name"], sample_flag_data["environment"], update_data)
+    assert result.updated_at == past
+    assert db_session.scalar(select(FeatureFlag.updated_at).where(FeatureFlag.id == created_flag.id)) == past
+
+
+def test_update_flag_ignores_stale_cache(db_session, sample_flag_create, sample_flag_data):
+    """Test that an update is applied even when the cached snapshot already matches it."""
+    created_flag = create_flag(db_session, sample_flag_create)
+    update_data = FeatureFlagUpdate(rollout=50)
+    update_flag(db_session, sample_flag_data["name"], sample_flag_data["environment"], update_data)
+    
+    # Another writer changes the row behind the cache's back
+    db_session.execute(update(FeatureFlag).where(FeatureFlag.id == created_flag.id).values(rollout=10))
+    db_session.commit()
+    
+    result = update_flag(db_session, sample_flag_data["name"], sample_flag_data["environment"], update_data)
+    assert result.rollout == 50
+    assert db_session.scalar(select(FeatureFlag.rollout).where(FeatureFlag.id == created_flag.id)) == 50
+
+
+def test_delete_flag(db_session, sample_flag_create, sample_flag_data):
     """Test deleting a feature flag."""
-    flag_data = FeatureFlagCreate(**sample_flag_data)
-    create_flag(db_session, flag_data)
+    create_flag(db_session, sample_flag_create)
     
     # Delete the flag
     success = delete_flag(db_session, sample_flag_data["name"], sample_flag_data["environment"])
@@ -170,4 +283,3 @@ def test_delete_nonexistent_flag(db_session):
     """Test deleting a flag that doesn't exist."""
     success = delete_flag(db_session, "nonexistent", "dev")
     assert success is False
-